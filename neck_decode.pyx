@@ -0,0 +1,38 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled neck-frame decoder (optional fast path).
+
+Build in place with:
+
+    pip install cython
+    cythonize -i neck_decode.pyx
+
+quadwave_midi_bridge falls back to the pure-Python decoder when this
+module isn't built, so compiling it is strictly optional.
+"""
+
+cdef extern from *:
+    int __builtin_ctz(unsigned int)
+
+
+cpdef list decode_neck(const unsigned char[::1] buf,
+                       Py_ssize_t offset,
+                       unsigned short[::1] state):
+    """Decode one 12-byte neck frame starting at ``buf[offset]``.
+
+    ``state`` holds the previous 16-bit mask per string and is updated in
+    place.  Returns a list of ``(string_idx, fret, on)`` tuples.
+    """
+    cdef list ev = []
+    cdef Py_ssize_t s, base
+    cdef unsigned int new, diff, lsb
+    for s in range(4):
+        base = offset + 3 * s
+        new = (buf[base] << 14) | (buf[base + 1] << 7) | buf[base + 2]
+        new &= 0xFFFF  # bits 16-20 don't map to frets and won't fit state[s]
+        diff = state[s] ^ new
+        while diff:
+            lsb = diff & (-diff)
+            ev.append((s, __builtin_ctz(lsb) + 1, (new & lsb) != 0))
+            diff ^= lsb
+        state[s] = new
+    return ev
@@ -6,15 +6,38 @@ Quadwave MIDI Bridge
 from __future__ import annotations
 
 import argparse
+import io
+import os
 import platform
+import select
 import signal
+import struct
 import sys
-import time
-from typing import Dict, List, Tuple
+import threading
+from array import array
+from typing import Iterator, List, Tuple
 
 import mido
 
+try:  # compiled fast path — see neck_decode.pyx; optional
+    from neck_decode import decode_neck as _c_decode_neck
+except ImportError:
+    _c_decode_neck = None
+
+try:  # only needed for NeckStateNp (bulk recording/replay); optional
+    import numpy as np
+except ImportError:
+    np = None
+
+try:  # JIT for decode_neck_batch; falls back to plain Python if absent
+    from numba import njit
+except ImportError:
+    def njit(**_kwargs):
+        return lambda f: f
+
 MFG_ID = [0x00, 0x22, 0x0A]
+_MFG_PREFIX = (0x00, 0x22, 0x0A)  # tuple form for comparing against msg.data
+_SYSEX = sys.intern("sysex")      # interned: pass-through check is a pointer compare
 NUM_STRINGS, MAX_TOUCHES = 4, 5   # Quadwave sends max 5 touches
 WIN = platform.system() == "Windows"
 
@@ -23,90 +46,233 @@ VALID_BITS = range(16)  # bit-0 → fret-1 … bit-15 → fret-16
 BIT_TO_FRET = {b: b + 1 for b in VALID_BITS}
 FRET_TO_BIT = {f: f - 1 for f in range(1, 17)}
 
+# cached (string_idx, fret) prefixes: events() concatenates instead of
+# packing fresh 3-tuples from boxed ints
+_NECK_TUP = [[(s, b + 1) for b in VALID_BITS] for s in range(NUM_STRINGS)]
+_ON_T, _OFF_T = (True,), (False,)
+
+# 4 strings × 3 bytes, unpacked in one C call
+_NECK_UNPACK = struct.Struct(">12B").unpack_from
+# one 6-byte touch record: x_lo x_hi y_lo y_hi z pressed
+_TOUCH_REC = struct.Struct("<6B").unpack_from
+
 # ───────────────── helper ─────────────────────────────────
 
-def _dump_ports() -> str:
-    ins = "\n  - ".join(mido.get_input_names()) or "<none>"
-    outs = "\n  - ".join(mido.get_output_names()) or "<none>"
-    return f"\nINPUTS:\n  - {ins}\n\nOUTPUTS:\n  - {outs}\n"
+def _dump_ports(ins: List[str] | None = None, outs: List[str] | None = None) -> str:
+    """Pretty-print the MIDI port lists; callers that already enumerated the
+    ports can pass them in to avoid a second device scan."""
+    buf = io.StringIO()
+    for label, names, getter in (
+        ("INPUTS", ins, mido.get_input_names),
+        ("OUTPUTS", outs, mido.get_output_names),
+    ):
+        buf.write(f"\n{label}:\n")
+        if names is None:
+            names = getter()
+        buf.writelines(f"  - {n}\n" for n in names or ["<none>"])
+    return buf.getvalue()
 
 # ───────────────── state classes ──────────────────────────
 class NeckState:
     def __init__(self):
         self.prev = [0] * NUM_STRINGS
         self.curr = [0] * NUM_STRINGS
+        self._state = array("H", [0] * NUM_STRINGS)  # used by the C decoder
 
-    def update(self, payload: List[int]):
-        self.prev = self.curr[:]
-        self.curr = []
-        for i in range(0, 12, 3):
-            b0, b1, b2 = payload[i], payload[i + 1], payload[i + 2]
-            self.curr.append((b0 << 14) | (b1 << 7) | b2)
+    def decode(self, buf: bytes, offset: int = 0):
+        """Decode one neck frame and return its events in a single step."""
+        if _c_decode_neck is not None:
+            return _c_decode_neck(buf, offset, self._state)
+        self.update(buf, offset)
+        return self.events()
 
-    def events(self) -> List[Tuple[int, int, bool]]:
-        ev = []
+    def update(self, buf: bytes, offset: int = 0):
+        b = _NECK_UNPACK(buf, offset)
+        # curr is rebuilt from scratch, so swapping references beats copying
+        self.prev, self.curr = self.curr, [
+            (b[i] << 14) | (b[i + 1] << 7) | b[i + 2] for i in (0, 3, 6, 9)
+        ]
+
+    def events(self) -> Iterator[Tuple[int, int, bool]]:
         for sidx, (p, c) in enumerate(zip(self.prev, self.curr)):
-            diff = p ^ c
-            for bit in VALID_BITS:
-                if diff & (1 << bit):
-                    ev.append((sidx, BIT_TO_FRET[bit], bool(c & (1 << bit))))
-        return ev
+            # three 7-bit bytes span bits 0-20; only bits 0-15 map to frets
+            diff = (p ^ c) & 0xFFFF
+            tups = _NECK_TUP[sidx]
+            # Iterate only the set bits (diff is usually 0): peel the lowest
+            # set bit each pass instead of testing all 16 positions.
+            while diff:
+                lsb = diff & -diff
+                yield tups[lsb.bit_length() - 1] + (_ON_T if c & lsb else _OFF_T)
+                diff ^= lsb
 
 
-class TouchState:
+class NeckStateNp:
+    """NumPy twin of NeckState for high-rate recording/replay sessions.
+
+    The whole-frame XOR and the ``.any()`` early-out run as single vector
+    ops, so unchanged frames (the vast majority) cost almost nothing.
+    The live callback keeps the plain NeckState; this needs numpy.
+    """
+
     def __init__(self):
-        self.prev: List[Dict[str, int | bool]] = []
-        self.curr: List[Dict[str, int | bool]] = []
+        if np is None:
+            raise RuntimeError("NeckStateNp requires numpy")
+        self.prev = np.zeros(NUM_STRINGS, dtype=np.uint16)
+        self.curr = np.zeros(NUM_STRINGS, dtype=np.uint16)
 
-    def update(self, payload: List[int]):
+    def update(self, buf: bytes, offset: int = 0):
+        raw = np.frombuffer(buf, dtype=np.uint8, count=12, offset=offset)
         self.prev = self.curr
-        nt = MAX_TOUCHES
-        touches = []
-        idx = 1
-        for _ in range(nt):
-            if idx + 6 > len(payload):
-                break
-            x_lo, x_hi, y_lo, y_hi, z, pressed = payload[idx : idx + 6]
-            touches.append({
-                "x": (x_hi << 7) | x_lo,
-                "y": (y_hi << 7) | y_lo,
-                "z": z,
-                "pressed": bool(pressed),
-            })
-            idx += 6
-        self.curr = touches
-
-    def events(self):
-        """Yield (tid, x, y, kind) where kind∈{pressed,released,drag}."""
+        # combine in uint32, then keep only the 16 fret bits (bytes are
+        # 7-bit, so the raw combine spans bits 0-20)
+        combined = (
+            (raw[0::3].astype(np.uint32) << 14)
+            | (raw[1::3].astype(np.uint32) << 7)
+            | raw[2::3]
+        )
+        self.curr = (combined & 0xFFFF).astype(np.uint16)
+
+    def events(self) -> List[Tuple[int, int, bool]]:
+        diff = self.prev ^ self.curr
+        if not diff.any():
+            return []
         ev = []
-        maxn = max(len(self.prev), len(self.curr))
-        for tid in range(maxn):
-            prev = self.prev[tid] if tid < len(self.prev) else {"x":0,"y":0,"z":0,"pressed":False}
-            curr = self.curr[tid] if tid < len(self.curr) else {"x":0,"y":0,"z":0,"pressed":False}
-            if not prev["pressed"] and curr["pressed"]:
-                ev.append((tid, curr["x"], curr["y"], curr["z"], "pressed"))
-            elif prev["pressed"] and not curr["pressed"]:
-                ev.append((tid, curr["x"], curr["y"], curr["z"], "released"))
-            elif prev["pressed"] and curr["pressed"] and ((prev["x"]!=curr["x"]) or (prev["y"]!=curr["y"])):
-                ev.append((tid, curr["x"], curr["y"], curr["z"], "drag"))
+        for sidx in np.nonzero(diff)[0]:
+            d, c = int(diff[sidx]), int(self.curr[sidx])
+            while d:
+                lsb = d & -d
+                ev.append((int(sidx), lsb.bit_length(), bool(c & lsb)))
+                d ^= lsb
         return ev
 
+
+@njit(cache=True)
+def _decode_neck_frames(frames, state, out):
+    m = 0
+    for f in range(frames.shape[0]):
+        for s in range(NUM_STRINGS):
+            new = (
+                (np.int64(frames[f, 3 * s]) << 14)
+                | (np.int64(frames[f, 3 * s + 1]) << 7)
+                | np.int64(frames[f, 3 * s + 2])
+            )
+            new &= 0xFFFF  # only the 16 fret bits; state is uint16
+            diff = np.int64(state[s]) ^ new
+            while diff:
+                lsb = diff & -diff
+                bit = 0
+                t = lsb >> 1
+                while t:
+                    bit += 1
+                    t >>= 1
+                out[m, 0] = s
+                out[m, 1] = bit + 1
+                out[m, 2] = 1 if new & lsb else 0
+                m += 1
+                diff ^= lsb
+            state[s] = new
+    return m
+
+
+def decode_neck_batch(frames, state=None):
+    """Decode a stack of raw 12-byte neck payloads in one JIT-compiled pass.
+
+    ``frames`` is anything reshapeable to (N, 12) uint8 — e.g.
+    ``np.frombuffer(dump)`` of a recorded session.  ``state`` carries the
+    per-string masks across calls (fresh zeros by default).  Returns an
+    (M, 3) int64 array of (string_idx, fret, on) rows in frame order.
+    Meant for offline dump replay; the live callback keeps the scalar path,
+    where JIT warm-up would dominate.
+    """
+    if np is None:
+        raise RuntimeError("decode_neck_batch requires numpy")
+    frames = np.ascontiguousarray(frames, dtype=np.uint8).reshape(-1, 12)
+    if state is None:
+        state = np.zeros(NUM_STRINGS, dtype=np.uint16)
+    out = np.empty((frames.shape[0] * NUM_STRINGS * 16, 3), dtype=np.int64)
+    m = _decode_neck_frames(frames, state, out)
+    return out[:m]
+
+
+class TouchState:
+    """Per-touch x/y/z/pressed kept as parallel arrays (SoA) rather than one
+    dict per touch — no dict allocs or string-key hashing on the hot path."""
+
+    def __init__(self):
+        zeros = [0] * MAX_TOUCHES
+        self.px, self.py, self.pz, self.pp = (array("H", zeros) for _ in range(4))
+        self.cx, self.cy, self.cz, self.cp = (array("H", zeros) for _ in range(4))
+        # (x << 16) | y packed per touch: drag detection is one int compare
+        self.pxy, self.cxy = array("I", zeros), array("I", zeros)
+        self.n_prev = self.n_curr = 0
+
+    def update(self, buf: bytes, offset: int = 0, end: int | None = None):
+        # Reuse the old prev buffers as the new curr: swap, then overwrite.
+        self.px, self.cx = self.cx, self.px
+        self.py, self.cy = self.cy, self.py
+        self.pz, self.cz = self.cz, self.pz
+        self.pp, self.cp = self.cp, self.pp
+        self.pxy, self.cxy = self.cxy, self.pxy
+        self.n_prev = self.n_curr
+        cx, cy, cz, cp, cxy = self.cx, self.cy, self.cz, self.cp, self.cxy
+        # clamp once so the loop needs no per-record bounds check; `end`
+        # matters when buf is an oversized reusable scratch buffer
+        if end is None:
+            end = len(buf)
+        n = min(MAX_TOUCHES, (end - offset - 1) // 6)
+        for i in range(n):
+            x_lo, x_hi, y_lo, y_hi, z, pressed = _TOUCH_REC(buf, offset + 1 + 6 * i)
+            x = (x_hi << 7) | x_lo
+            y = (y_hi << 7) | y_lo
+            cx[i] = x
+            cy[i] = y
+            cz[i] = z
+            cp[i] = 1 if pressed else 0
+            cxy[i] = (x << 16) | y
+        self.n_curr = n
+
+    def events(self) -> Iterator[Tuple[int, int, int, int, str]]:
+        """Yield (tid, x, y, z, kind) where kind∈{pressed,released,drag}."""
+        n_prev, n_curr = self.n_prev, self.n_curr
+        for tid in range(max(n_prev, n_curr)):
+            pp = self.pp[tid] if tid < n_prev else 0
+            if tid < n_curr:
+                cp, cx, cy, cz = self.cp[tid], self.cx[tid], self.cy[tid], self.cz[tid]
+            else:
+                cp = cx = cy = cz = 0
+            if not pp and cp:
+                yield (tid, cx, cy, cz, "pressed")
+            elif pp and not cp:
+                yield (tid, cx, cy, cz, "released")
+            elif pp and cp and self.pxy[tid] != self.cxy[tid]:
+                yield (tid, cx, cy, cz, "drag")
+
 # ───────────────── bridge ─────────────────────────────────
 class QuadwaveBridge:
     def __init__(self, in_port: str | None, out_port: str | None):
         self.in_name = in_port or self._auto_in()
         self.out_name, self.outport = self._open_out(out_port)
+        self._send = self.outport.send  # bound once; _handle runs per message
         self.inport = mido.open_input(self.in_name, callback=self._handle)
         self.neck, self.touch = NeckState(), TouchState()
+        # Last raw frame per msg-ID: the firmware re-sends unchanged state,
+        # so most frames can bail on a single memcmp before any decoding.
+        self._last_neck: tuple | None = None
+        self._last_touch: tuple | None = None
+        # Persistent buffer the struct unpackers read from; filling it by
+        # slice assignment from msg.data allocates nothing per frame.
+        self._scratch = bytearray(64)
+        self._stop = threading.Event()
         print(f"[Bridge] 🚀 '{self.in_name}' → '{self.out_name}'. Ctrl-C to quit.")
 
     # -------- port helpers --------
     @staticmethod
     def _auto_in():
-        for n in mido.get_input_names():
-            if any(k in n.lower() for k in ("Misa Quadwave")):
+        names = mido.get_input_names()
+        for n in names:
+            if "misa quadwave" in n.casefold():
                 return n
-        raise RuntimeError("Quadwave input not found" + _dump_ports())
+        raise RuntimeError("Quadwave input not found" + _dump_ports(ins=names))
 
     def _open_out(self, requested):
         outs = mido.get_output_names()
@@ -128,10 +294,18 @@ class QuadwaveBridge:
         raise RuntimeError("Need loopMIDI port" + _dump_ports())
 
     # -------- run loop --------
-    def run(self):
+    def run(self, wake_fd: int | None = None):
+        # The mido callback runs on its own thread; the main thread only has
+        # to sleep until Ctrl-C, so block instead of waking at 10 Hz.  With a
+        # wakeup fd (POSIX), signal delivery unblocks select() immediately.
         try:
-            while True:
-                time.sleep(0.1)
+            if wake_fd is not None:
+                select.select([wake_fd], [], [])
+            else:
+                # Timed wait: a no-timeout Event.wait() sits in a lock
+                # acquire that Ctrl-C can't interrupt on Windows.
+                while not self._stop.wait(1.0):
+                    pass
         except KeyboardInterrupt:
             print("[Bridge] 👋 Bye")
         finally:
@@ -140,31 +314,62 @@ class QuadwaveBridge:
     # -------- handler --------
     # Start hacking here!
     def _handle(self, msg):
-        if msg.type != "sysex": # Pass-through any MIDI from the Quadwave
-            self.outport.send(msg); return
-        data = list(msg.data)
-        if data[:3] != MFG_ID:
-            self.outport.send(msg); return
-        msg_id = data[3]
-        payload = data[4:]
-        if msg_id == 0x01: # Handle Neck event
-            self.neck.update(payload)
-            for s, fret, on in self.neck.events():
-                print(f"String {s+1} fret {fret} {'ON' if on else 'OFF'}")
-        elif msg_id == 0x02: # Handle Touchpad event
-            self.touch.update(payload)
-            for tid, x, y, z, kind in self.touch.events():
-                if kind == "pressed":
-                    print(f"Touch {tid} pressed at x={x} y={y} z={z}")
-                elif kind == "released":
-                    print(f"Touch {tid} released at x={x} y={y} z={z}")
-                elif kind == "drag":
-                    print(f"Touch {tid} dragged to x={x} y={y} z={z}")
-        elif msg_id == 0x03: # Handle Configuration Change event (5 presses on touchpad)
-            colors = ['blue', 'green', 'purple']
-            config_id = payload[0]
-            print(f"Config set to {colors[config_id]}")
-            print(f"Firmware version: {payload[1]}.{payload[2]}.{payload[3]}")
+        if msg.type != _SYSEX: # Pass-through any MIDI from the Quadwave
+            self._send(msg); return
+        d = msg.data  # mido hands us a tuple; don't copy it into a list
+        if d[:3] != _MFG_PREFIX:
+            self._send(msg); return
+        fn = self._DISPATCH.get(d[3])
+        if fn:
+            fn(self, d)
+
+    # Per-frame handlers collect all lines and write them in one go: one
+    # write() syscall instead of one per event on a line-buffered stdout.
+    # The duplicate-frame check compares msg.data tuples directly; the
+    # scratch bytearray gives struct a buffer without a bytes() per frame.
+    def _on_neck(self, d):
+        if len(d) < 16:  # header + 12 bytes; don't decode stale scratch bytes
+            return
+        if d == self._last_neck:
+            return
+        self._last_neck = d
+        buf = self._scratch
+        buf[: len(d)] = d  # payload starts at 4
+        out = [
+            "String %d fret %d %s\n" % (s + 1, fret, "ON" if on else "OFF")
+            for s, fret, on in self.neck.decode(buf, 4)
+        ]
+        if out:
+            sys.stdout.write("".join(out))
+
+    def _on_touch(self, d):
+        if d == self._last_touch:
+            return
+        self._last_touch = d
+        buf = self._scratch
+        buf[: len(d)] = d
+        self.touch.update(buf, 4, len(d))
+        out = []
+        for tid, x, y, z, kind in self.touch.events():
+            if kind == "pressed":
+                out.append("Touch %d pressed at x=%d y=%d z=%d\n" % (tid, x, y, z))
+            elif kind == "released":
+                out.append("Touch %d released at x=%d y=%d z=%d\n" % (tid, x, y, z))
+            elif kind == "drag":
+                out.append("Touch %d dragged to x=%d y=%d z=%d\n" % (tid, x, y, z))
+        if out:
+            sys.stdout.write("".join(out))
+
+    def _on_config(self, d):
+        # Configuration Change event (5 presses on touchpad)
+        colors = ['blue', 'green', 'purple']
+        sys.stdout.write(
+            "Config set to %s\nFirmware version: %d.%d.%d\n"
+            % (colors[d[4]], d[5], d[6], d[7])
+        )
+
+    # msg-ID → handler; new SysEx IDs register here instead of growing _handle
+    _DISPATCH = {0x01: _on_neck, 0x02: _on_touch, 0x03: _on_config}
 
 # ───────────────── CLI ─────────────────────────────────────
 
@@ -174,9 +379,17 @@ def main(argv=None):
     args = p.parse_args(argv)
     if args.list_ports:
         print(_dump_ports()); sys.exit(0)
-    bridge = QuadwaveBridge(args.in_port, args.out_port)
+    # Wire up SIGINT before any ports (and their C callback threads) exist:
+    # the wakeup fd bounds Ctrl-C latency instead of waiting for the
+    # interpreter to get around to running Python signal handlers.
+    wake_r = None
+    if not WIN:
+        wake_r, wake_w = os.pipe()
+        os.set_blocking(wake_w, False)
+        signal.set_wakeup_fd(wake_w)
     signal.signal(signal.SIGINT, signal.default_int_handler)
-    bridge.run()
+    bridge = QuadwaveBridge(args.in_port, args.out_port)
+    bridge.run(wake_r)
 
 if __name__ == "__main__":
     main()
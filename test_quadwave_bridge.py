@@ -12,7 +12,7 @@ class StubMsg(SimpleNamespace):
     """Minimal stand-in for `mido.Message` (only .type & .data)."""
 
     def __init__(self, type_: str, data):
-        super().__init__(type=type_, data=data)
+        super().__init__(type=type_, data=tuple(data))  # mido exposes a tuple
 
 
 class FakePort:
@@ -145,5 +145,35 @@ class QuadwaveBridgeLogicTest(unittest.TestCase):
         self.assertEqual(out, expected)
 
 
+@unittest.skipUnless(qwb.np is not None, "numpy not installed")
+class DecodeNeckBatchTest(unittest.TestCase):
+    def test_two_frame_replay(self):
+        frames = qwb.np.zeros((3, 12), dtype=qwb.np.uint8)
+        frames[0, 2] = 1      # string 1 fret 1 ON
+        frames[1, 2] = 1      # unchanged → no events
+        frames[2, 2] = 0      # OFF
+        ev = qwb.decode_neck_batch(frames)
+        self.assertEqual(ev.tolist(), [[0, 1, 1], [0, 1, 0]])
+
+    def test_high_payload_bits_ignored(self):
+        # 0x7F sets bits 14-20; only 14/15 are frets, and an identical
+        # second frame must not re-emit them
+        frames = qwb.np.zeros((2, 12), dtype=qwb.np.uint8)
+        frames[:, 0] = 0x7F
+        ev = qwb.decode_neck_batch(frames)
+        self.assertEqual(ev.tolist(), [[0, 15, 1], [0, 16, 1]])
+
+
+@unittest.skipUnless(qwb.np is not None, "numpy not installed")
+class NeckStateNpTest(unittest.TestCase):
+    def test_high_payload_bits_ignored(self):
+        # 0x7F in a string's first byte sets bits 14-20; only 14/15 are frets
+        state = qwb.NeckStateNp()
+        state.update(bytes([0x7F, 0, 0] + [0, 0, 0] * 3))
+        self.assertEqual(state.events(), [(0, 15, True), (0, 16, True)])
+        state.update(bytes([0x7F, 0, 0] + [0, 0, 0] * 3))
+        self.assertEqual(state.events(), [])
+
+
 if __name__ == "__main__":
     unittest.main()